@@ -12,6 +12,7 @@ import json
 import base64
 import logging
 import subprocess
+import tempfile
 from typing import Optional, Dict, Any, List, Union
 
 # Set up FastAPI
@@ -28,6 +29,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger("spongecake-api")
 
+# xdotool mouse button numbers for each click type (matches the Desktop class)
+XDOTOOL_CLICK_BUTTONS = {"left": 1, "middle": 2, "wheel": 2, "right": 3}
+
+# xdotool keysyms for key names the model sends that xdotool spells differently
+XDOTOOL_SPECIAL_KEYS = {
+    "enter": "Return", "return": "Return", "space": "space", "tab": "Tab",
+    "esc": "Escape", "escape": "Escape", "backspace": "BackSpace", "delete": "Delete",
+    "home": "Home", "end": "End", "pageup": "Page_Up", "pagedown": "Page_Down",
+    "arrowup": "Up", "arrowdown": "Down", "arrowleft": "Left", "arrowright": "Right",
+}
+
+# Modifier key names the model sends, mapped to the xdotool modifier they hold down
+XDOTOOL_MODIFIER_KEYS = {"CTRL": "ctrl", "SHIFT": "shift", "ALT": "alt", "META": "super"}
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Spongecake API",
@@ -101,14 +116,7 @@ def click(x: int, y: int, button: str = "left") -> Dict[str, Any]:
     """
     logger.info(f"Clicking at ({x}, {y}) with {button} button")
     
-    # Match the button mapping from Desktop class
-    button_map = {
-        "left": 1,
-        "middle": 2,
-        "wheel": 2,
-        "right": 3
-    }
-    button_num = button_map.get(button.lower(), 1)
+    button_num = XDOTOOL_CLICK_BUTTONS.get(button.lower(), 1)
     
     logger.info(f"Action: click at ({x}, {y}) with button '{button}' -> mapped to {button_num}")
     command = ["xdotool", "mousemove", str(x), str(y), "click", str(button_num)]
@@ -125,22 +133,24 @@ def scroll(x: int, y: int, scroll_x: int = 0, scroll_y: int = 0) -> Dict[str, An
     """
     logger.info(f"Scrolling at ({x}, {y}) with delta (scroll_x={scroll_x}, scroll_y={scroll_y})")
     
-    # First move to the position
-    execute_command(["xdotool", "mousemove", str(x), str(y)])
+    # Move to the position and scroll in a single xdotool invocation
+    command = ["xdotool", "mousemove", str(x), str(y)]
     
     # Vertical scroll (button 4 = up, button 5 = down)
     if scroll_y != 0:
         button = "4" if scroll_y < 0 else "5"
-        # Use a fixed number of clicks (3) as in the Desktop class
-        for _ in range(3):
-            execute_command(["xdotool", "click", button])
+        # One wheel click per 100px of delta, as in the Desktop class
+        clicks = max(1, abs(scroll_y) // 100)
+        command += ["click", "--repeat", str(clicks), "--delay", "1", button]
     
     # Horizontal scroll (button 6 = left, button 7 = right)
     if scroll_x != 0:
         button = "6" if scroll_x < 0 else "7"
-        # Use a fixed number of clicks (3) as in the Desktop class
-        for _ in range(3):
-            execute_command(["xdotool", "click", button])
+        # One wheel click per 100px of delta, as in the Desktop class
+        clicks = max(1, abs(scroll_x) // 100)
+        command += ["click", "--repeat", str(clicks), "--delay", "1", button]
+    
+    execute_command(command)
     
     return {
         "status": "success", 
@@ -160,36 +170,45 @@ def keypress(keys: List[str]) -> Dict[str, Any]:
     """
     logger.info(f"Pressing keys: {keys}")
     
-    ctrl_pressed = False
-    shift_pressed = False
+    modifiers = [XDOTOOL_MODIFIER_KEYS[k.upper()] for k in keys if k.upper() in XDOTOOL_MODIFIER_KEYS]
+    if modifiers and len(modifiers) == len(keys) - 1 and keys[-1].upper() not in XDOTOOL_MODIFIER_KEYS:
+        # Modifiers followed by a single key (e.g. CTRL+F): let xdotool press the
+        # combo atomically, so no modifier can be left stuck down
+        combo = "+".join(modifiers + [XDOTOOL_SPECIAL_KEYS.get(keys[-1].lower(), keys[-1].lower())])
+        logger.info(f"    => pressing {combo}")
+        execute_command(["xdotool", "key", "--clearmodifiers", combo])
+        return {"status": "success", "action": "keypress", "keys": keys}
+
+    # Build a single xdotool invocation chaining all key steps; runs of regular
+    # keys share one `key` command, e.g. "keydown ctrl key h e keyup ctrl"
+    command = ["xdotool"]
+    pending_keys = []
+    held_modifiers = []
+
+    def flush_keys():
+        if pending_keys:
+            command.extend(["key", *pending_keys])
+            pending_keys.clear()
     
     for k in keys:
         # Handle special modifiers
-        if k.upper() == 'CTRL':
-            logger.info("    => holding down CTRL")
-            execute_command(["xdotool", "keydown", "ctrl"])
-            ctrl_pressed = True
-        elif k.upper() == 'SHIFT':
-            logger.info("    => holding down SHIFT")
-            execute_command(["xdotool", "keydown", "shift"])
-            shift_pressed = True
-        # Check special keys
-        elif k.lower() == "enter":
-            execute_command(["xdotool", "key", "Return"])
-        elif k.lower() == "space":
-            execute_command(["xdotool", "key", "space"])
+        if k.upper() in XDOTOOL_MODIFIER_KEYS:
+            logger.info(f"    => holding down {k.upper()}")
+            flush_keys()
+            modifier = XDOTOOL_MODIFIER_KEYS[k.upper()]
+            command += ["keydown", modifier]
+            held_modifiers.append(modifier)
         else:
-            # For normal alphabetic or punctuation
-            lower_k = k.lower()  # xdotool keys are typically lowercase
-            execute_command(["xdotool", "key", lower_k])
+            # Special keys map to their keysym; xdotool keys are typically lowercase
+            pending_keys.append(XDOTOOL_SPECIAL_KEYS.get(k.lower(), k.lower()))
+    flush_keys()
 
     # Release modifiers
-    if ctrl_pressed:
-        logger.info("    => releasing CTRL")
-        execute_command(["xdotool", "keyup", "ctrl"])
-    if shift_pressed:
-        logger.info("    => releasing SHIFT")
-        execute_command(["xdotool", "keyup", "shift"])
+    for modifier in held_modifiers:
+        logger.info(f"    => releasing {modifier.upper()}")
+        command += ["keyup", modifier]
+    
+    execute_command(command)
     
     return {"status": "success", "action": "keypress", "keys": keys}
 
@@ -197,8 +216,9 @@ def type_text(text: str) -> Dict[str, Any]:
     """Type text."""
     logger.info(f"Typing text: {text}")
     
-    # Use --clearmodifiers to clear any stuck modifier keys
-    execute_command(["xdotool", "type", "--clearmodifiers", text])
+    # Use --clearmodifiers to clear any stuck modifier keys, and skip the default
+    # 12ms inter-keystroke delay; `--` keeps text starting with '-' from being read as options
+    execute_command(["xdotool", "type", "--delay", "0", "--clearmodifiers", "--", text])
     
     return {"status": "success", "action": "type", "text": text}
 
@@ -224,6 +244,36 @@ def goto(url: str) -> Dict[str, Any]:
     
     return {"status": "success", "action": "goto", "url": url}
 
+def capture_png() -> bytes:
+    """Capture the screen as raw PNG bytes.
+    
+    Uses scrot (much faster than ImageMagick's import) writing to a temp file, since
+    the scrot shipped with the base image can't write to stdout. Falls back to import
+    if scrot fails or produces nothing.
+    """
+    env = {**os.environ, "DISPLAY": ":99"}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "screenshot.png")
+        try:
+            subprocess.run(["scrot", path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env, check=True)
+            with open(path, "rb") as f:
+                png = f.read()
+            if png:
+                return png
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"scrot failed ({e}), falling back to import")
+    
+    result = subprocess.run(
+        ["import", "-window", "root", "png:-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        check=True
+    )
+    if not result.stdout:
+        raise RuntimeError("Screenshot capture returned no image data")
+    return result.stdout
+
 def take_screenshot() -> Dict[str, Any]:
     """Take a screenshot and return it as base64.
     
@@ -233,16 +283,8 @@ def take_screenshot() -> Dict[str, Any]:
     logger.info("Taking screenshot")
     
     try:
-        # Use ImageMagick's import command to capture the screen
-        # The command captures the root window and outputs PNG data to stdout
-        # Then we pipe it to base64 to encode it
-        result = execute_command([
-            "bash", "-c", 
-            "export DISPLAY=:99 && import -window root png:- | base64 -w 0"
-        ])
-        
-        # The result is already base64-encoded
-        base64_data = result.strip()
+        # base64-encode the raw PNG in Python (no extra `base64` process)
+        base64_data = base64.b64encode(capture_png()).decode("ascii")
         
         return {
             "status": "success", 
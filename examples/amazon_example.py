@@ -68,7 +68,7 @@ def error_handler(error_message):
 
 def main():
     # Start up an isolated desktop. Edit desktop name, and docker_image if needed
-    desktop = Desktop(name="newdesktop")
+    desktop = Desktop(name="newdesktop", debug_save_screenshots=True)
     container = desktop.start()
     desktop.goto("https://www.amazon.com")
     print("🍰 spongecake container started:", container)
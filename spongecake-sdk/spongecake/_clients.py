@@ -0,0 +1,31 @@
+import threading
+
+import docker
+
+# Process-wide clients shared by every Desktop and Agent, so that running many desktops in
+# one process doesn't open a Docker socket connection and an OpenAI HTTP pool per instance.
+_docker_client = None
+_docker_lock = threading.Lock()
+
+_openai_clients = {}
+_openai_lock = threading.Lock()
+
+
+def get_docker_client():
+    """Return the shared Docker client, creating it from the environment on first use."""
+    global _docker_client
+    with _docker_lock:
+        if _docker_client is None:
+            _docker_client = docker.from_env()
+        return _docker_client
+
+
+def get_openai_client(api_key: str):
+    """Return the shared OpenAI client for `api_key`, creating it on first use."""
+    with _openai_lock:
+        client = _openai_clients.get(api_key)
+        if client is None:
+            # Imported lazily so importing spongecake doesn't pay for the openai package
+            from openai import OpenAI
+            client = _openai_clients[api_key] = OpenAI(api_key=api_key)
+        return client
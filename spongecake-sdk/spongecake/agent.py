@@ -1,8 +1,10 @@
 import base64
+import functools
 import logging
 import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Union, Tuple
-from openai import OpenAI
 
 # Import from constants module
 from .constants import AgentStatus
@@ -10,6 +12,27 @@ from .constants import AgentStatus
 # Set up logger
 logger = logging.getLogger(__name__)
 
+def _write_screenshot(screenshot_base64, path="output_image.png"):
+    """
+    Decode a base64 screenshot and write it to disk (runs on the agent's I/O pool).
+
+    Desktop.get_screenshot() already returns base64 text, which is passed to the API
+    as-is; this is the only place it is ever decoded.
+    """
+    Path(path).write_bytes(base64.b64decode(screenshot_base64))
+    logger.info("* Saved image data.")
+
+def _log_write_failure(future):
+    """Done-callback for screenshot writes: surface errors that would otherwise be dropped."""
+    error = future.exception()
+    if error is not None:
+        logger.error(f"Failed to save debug screenshot: {error}")
+
+def _screenshot_input_image(screenshot_base64, mime_type="image/png"):
+    """Build the `input_image` output for a base64 screenshot."""
+    # Plain concatenation: no formatting needed for a potentially megabyte-sized payload
+    return {"type": "input_image", "image_url": "data:" + mime_type + ";base64," + screenshot_base64}
+
 class Agent:
     """
     Agent class for integrating OpenAI's agent capabilities with a desktop environment.
@@ -21,7 +44,7 @@ class Agent:
     status-based API.
     """
 
-    def __init__(self, desktop=None, openai_api_key=None):
+    def __init__(self, desktop=None, openai_api_key=None, debug_save_screenshots: bool = False):
         """
         Initialize an Agent instance.
         
@@ -29,28 +52,34 @@ class Agent:
             desktop: A Desktop instance to control. Can be set later with set_desktop().
             openai_api_key: OpenAI API key for authentication. If None, will try to use
                            the one from the desktop or environment variables.
+            debug_save_screenshots: If True, write every screenshot sent to the model to
+                                   output_image.png for debugging.
         """
         self.desktop = desktop
+        self._debug_save_screenshots = debug_save_screenshots
         
-        # Set up OpenAI API key and client
+        # Set up OpenAI API key; the client itself is created on first use
         if openai_api_key is None and desktop is not None:
             openai_api_key = desktop.openai_api_key
-            
-        if openai_api_key is not None:
-            self.openai_api_key = openai_api_key
-            self.openai_client = OpenAI(api_key=openai_api_key)
-        else:
-            self.openai_api_key = None
-            self.openai_client = None
+        self.openai_api_key = openai_api_key
             
         # Initialize state tracking
         self._response_history = []  # List of all responses from the API
         self._input_history = []     # List of all inputs sent to the API
+        self._response_history_view = ()  # Read-only snapshot of _response_history (None when stale)
+        self._input_history_view = ()     # Read-only snapshot of _input_history (None when stale)
         self._current_response = None  # Current response object
         self._pending_call = None     # Pending computer call that needs safety check acknowledgment
         self._pending_safety_checks = []  # Pending safety checks
+        self._call_queue = []         # computer_calls from the current response not yet executed
+        self._executed_calls = []     # (call, acknowledged_checks) executed but not yet answered
         self._needs_input = []        # Messages requesting user input
         self._error = None            # Last error message, if any
+        self._default_tools = None    # Cached default tool definitions for the current desktop
+
+        # Background worker for screenshot disk writes so they overlap with API requests.
+        # Created on first use and shut down by close().
+        self._io_pool = None
 
     def set_desktop(self, desktop):
         """
@@ -64,7 +93,62 @@ class Agent:
         # If we don't have an API key yet, try to get it from the desktop
         if self.openai_api_key is None and desktop.openai_api_key is not None:
             self.openai_api_key = desktop.openai_api_key
-            self.openai_client = OpenAI(api_key=self.openai_api_key)
+            # Drop any cached client so the next access picks up the new key
+            self.__dict__.pop("openai_client", None)
+
+    @property
+    def desktop(self):
+        """The Desktop instance this agent controls."""
+        return self._desktop
+
+    @desktop.setter
+    def desktop(self, desktop):
+        # Every assignment rebinds the cached action methods, so they never point at an old desktop
+        self._desktop = desktop
+        self._bind_desktop_actions(desktop)
+        self._default_tools = None  # Rebuilt for the new desktop on the next API call
+
+    def close(self):
+        """Wait for pending debug screenshot writes and shut down the background writer."""
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=True)
+            self._io_pool = None
+
+    def _save_debug_screenshot(self, screenshot_base64):
+        """Write a debug screenshot on the background writer, logging any failure."""
+        if self._io_pool is None:
+            # A single worker keeps the writes in order and bounds the extra threads to one
+            self._io_pool = ThreadPoolExecutor(max_workers=1)
+        future = self._io_pool.submit(_write_screenshot, screenshot_base64, self._debug_screenshot_path())
+        future.add_done_callback(_log_write_failure)
+
+    def _bind_desktop_actions(self, desktop):
+        """Cache the desktop's bound action methods used on every agent step."""
+        if desktop is None:
+            return
+        self._click = desktop.click
+        self._scroll = desktop.scroll
+        self._keypress = desktop.keypress
+        self._type_text = desktop.type_text
+        self._get_screenshot = desktop.get_screenshot
+
+    def _debug_screenshot_path(self):
+        """File that debug screenshots are saved to, with an extension matching their format."""
+        return "output_image.jpg" if self.desktop.screenshot_mime_type == "image/jpeg" else "output_image.png"
+
+    @functools.cached_property
+    def openai_client(self):
+        """
+        OpenAI client for this agent, created on first access.
+        
+        The openai package is imported lazily so that importing the agent module (e.g. just
+        for AgentStatus) doesn't pay for it. Clients are shared per API key across agents and
+        desktops. Returns None if no API key is available.
+        """
+        if self.openai_api_key is None:
+            return None
+        from ._clients import get_openai_client
+        return get_openai_client(self.openai_api_key)
 
     def handle_model_action(self, action):
         """
@@ -75,39 +159,51 @@ class Agent:
             action: An action object from the OpenAI model response.
             
         Returns:
-            Screenshot bytes if the action is a screenshot, None otherwise.
+            The base64-encoded PNG screenshot if the action is a screenshot, None otherwise.
         """
         if self.desktop is None:
             raise ValueError("No desktop has been set for this agent.")
-            
-        action_type = action.type
 
-        try:
-            if action_type == "click":
-                x, y = int(action.x), int(action.y)
-                self.desktop.click(x, y, action.button)
-            elif action_type == "scroll":
-                x, y = int(action.x), int(action.y)
-                scroll_x, scroll_y = int(action.scroll_x), int(action.scroll_y)
-                self.desktop.scroll(x, y, scroll_x=scroll_x, scroll_y=scroll_y)
-            elif action_type == "keypress":
-                keys = action.keys
-                self.desktop.keypress(keys)
-            elif action_type == "type":
-                text = action.text
-                self.desktop.type_text(text)
-            elif action_type == "wait":
-                time.sleep(2)
-            elif action_type == "screenshot":
-                # Nothing to do as screenshot is taken at each turn
-                screenshot_bytes = self.desktop.get_screenshot()
-                return screenshot_bytes
-            else:
-                logger.info(f"Unrecognized action: {action}")
+        handler = self._ACTION_HANDLERS.get(action.type)
+        if handler is None:
+            logger.info(f"Unrecognized action: {action}")
+            return None
 
+        try:
+            return handler(self, action)
         except Exception as e:
             logger.error(f"Error handling action {action}: {e}")
 
+    # Per-action handlers used by handle_model_action's dispatch table
+    def _do_click(self, action):
+        self._click(int(action.x), int(action.y), action.button)
+
+    def _do_scroll(self, action):
+        self._scroll(int(action.x), int(action.y),
+                     scroll_x=int(action.scroll_x), scroll_y=int(action.scroll_y))
+
+    def _do_keypress(self, action):
+        self._keypress(action.keys)
+
+    def _do_type(self, action):
+        self._type_text(action.text)
+
+    def _do_wait(self, action):
+        time.sleep(2)
+
+    def _do_screenshot(self, action):
+        # Nothing to do as screenshot is taken at each turn
+        return self._get_screenshot()
+
+    _ACTION_HANDLERS = {
+        "click": _do_click,
+        "scroll": _do_scroll,
+        "keypress": _do_keypress,
+        "type": _do_type,
+        "wait": _do_wait,
+        "screenshot": _do_screenshot,
+    }
+
     def _auto_generate_input(self, question: str, input_history=None) -> str:
         """Generate an automated response to agent questions using OpenAI.
         
@@ -232,133 +328,162 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
             - response: the latest (or final) response object
             - messages: a list of "message" items if user input is requested (or None)
             - safety_checks: a list of pending safety checks if any (or None)
-            - pending_call: if there's exactly one computer_call that was paused
+            - pending_call: if a computer_call was paused
                 due to safety checks, return that here so the caller can handle it
                 after the user acknowledges the checks.
             - needs_input: boolean indicating if messages require more input
         """
         if self.desktop is None:
             raise ValueError("No desktop has been set for this agent.")
+
+        while True:
+            # Check for function calls and handle them
+            function_calls = [item for item in response.output if item.type == "function_call"]
+            if function_calls:
+                import json
+                input_messages = []
             
-        # Check for function calls and handle them
-        function_calls = [item for item in response.output if item.type == "function_call"]
-        if function_calls:
-            import json
-            input_messages = []
-            
-            for tool_call in function_calls:
-                name = tool_call.name
-                args = json.loads(tool_call.arguments) if hasattr(tool_call, 'arguments') and tool_call.arguments else {}
+                for tool_call in function_calls:
+                    name = tool_call.name
+                    args = json.loads(tool_call.arguments) if hasattr(tool_call, 'arguments') and tool_call.arguments else {}
                 
-                # Dispatch to the appropriate function
-                if name == "get_page_html":
-                    result = self.get_page_html(**args)
-                elif function_map and name in function_map:
-                    # Use the provided function map for custom functions
-                    logger.info(f"[TOOL CALL] Calling function: {name}, with arguments: {args}")
-                    result = function_map[name](**args)
-                else:
-                    logger.info(f"[TOOL CALL] Function: {name} not found in function map. Unable to call.")
-                    result = f"Function {name} not implemented"
+                    # Dispatch to the appropriate function
+                    if name == "get_page_html":
+                        result = self.get_page_html(**args)
+                    elif function_map and name in function_map:
+                        # Use the provided function map for custom functions
+                        logger.info(f"[TOOL CALL] Calling function: {name}, with arguments: {args}")
+                        result = function_map[name](**args)
+                    else:
+                        logger.info(f"[TOOL CALL] Function: {name} not found in function map. Unable to call.")
+                        result = f"Function {name} not implemented"
                     
-                # Add the result to input messages
-                input_messages.append({
-                    "type": "function_call_output",
-                    "call_id": tool_call.call_id,
-                    "output": str(result)
-                })
+                    # Add the result to input messages
+                    input_messages.append({
+                        "type": "function_call_output",
+                        "call_id": tool_call.call_id,
+                        "output": str(result)
+                    })
                 
-            # Create a new response with the function results
-            new_response = self._create_response(
-                input_data=input_messages,
-                previous_response_id=response.id,
-                custom_tools=custom_tools
-            )
+                # Create a new response with the function results
+                new_response = self._create_response(
+                    input_data=input_messages,
+                    previous_response_id=response.id,
+                    custom_tools=custom_tools
+                )
             
-            # Add to response history
-            self._response_history.append(new_response)
-            self._current_response = new_response
+                # Add to response history
+                self._record_response(new_response)
+                self._current_response = new_response
             
-            # Continue the loop with the new response
-            return self.computer_use_loop(new_response, custom_tools=custom_tools, function_map=function_map)
+                # Continue the loop with the new response
+                response = new_response
+                continue
         
-        # Identify all message items (the agent wants text input)
-        messages = [item for item in response.output if item.type == "message"]
+            # Scan the output once, collecting message items (the agent wants text input)
+            # and computer_call items.
+            messages, computer_calls = [], []
+            for item in response.output:
+                item_type = item.type
+                if item_type == "message":
+                    messages.append(item)
+                elif item_type == "computer_call":
+                    computer_calls.append(item)
 
-        # Identify any computer_call items
-        computer_calls = [item for item in response.output if item.type == "computer_call"]
+            # If there's no computer_call at all, but we do have messages
+            # we return them so the caller can handle user input.
+            if not computer_calls:
+                if messages:
+                    return response, messages, None, None
+                # Otherwise, no calls, no messages => done
+                logger.info("No actionable computer_call or interactive prompt found. Finishing loop.")
+                return response, None, None, None
 
-        # For simplicity, assume the agent only issues ONE call at a time
-        computer_call = computer_calls[0] if computer_calls else None
+            # Execute the calls in order. If one of them carries safety checks we stop
+            # right before it and return it as the "pending_call" with only its own checks,
+            # so the user can acknowledge them first. The calls already executed are
+            # answered together with it once the checks are acknowledged.
+            self._call_queue = list(computer_calls)
+            self._executed_calls = []
+            pending_call = self._run_queued_calls()
+            if pending_call:
+                return response, messages or None, pending_call.pending_safety_checks, pending_call
 
-        # Identify all safety checks across items
-        all_safety_checks = []
-        for item in response.output:
-            checks = getattr(item, "pending_safety_checks", None)
-            if checks:
-                all_safety_checks.extend(checks)
+            # Continue the loop with the updated response
+            response = self._send_call_outputs(response, custom_tools=custom_tools)
 
-        # If there's a computer_call that also has safety checks,
-        # we must return immediately so the user can acknowledge them first.
-        # We'll do so by returning the "pending_call" plus the checks.
-        if computer_call and all_safety_checks:
-            return response, messages or None, all_safety_checks, computer_call
-
-        # If there's no computer_call at all, but we do have messages or checks
-        # we return them so the caller can handle user input or safety checks.
-        if not computer_call:
-            if messages or all_safety_checks:
-                return response, messages or None, all_safety_checks or None, None
-            # Otherwise, no calls, no messages, no checks => done
-            logger.info("No actionable computer_call or interactive prompt found. Finishing loop.")
-            return response, None, None, None
+    def _run_queued_calls(self):
+        """
+        Execute queued computer_calls in order until one carries pending safety checks.
 
-        # If we got here, that means there's a computer_call *without* any safety checks,
-        # so we can proceed to execute it right away.
+        Returns:
+            The call that needs acknowledgment (left at the head of the queue),
+            or None once every queued call has been executed.
+        """
+        while self._call_queue:
+            call = self._call_queue[0]
+            # Only computer_call items carry pending_safety_checks (always a list)
+            if call.pending_safety_checks:
+                return call
+            self._call_queue.pop(0)
+            self.handle_model_action(call.action)
+            self._executed_calls.append((call, None))
+        return None
 
-        # Execute the call
-        self.handle_model_action(computer_call.action)
+    def _send_call_outputs(self, response, custom_tools=None):
+        """
+        Take one screenshot and send it back as a `computer_call_output` for every executed
+        call, all in a single request. Acknowledged safety checks are attached only to the
+        output of the call they belong to.
+        """
         time.sleep(1)  # small delay to allow environment changes
 
-        # Take a screenshot
-        screenshot_base64 = self.desktop.get_screenshot()
-        image_data = base64.b64decode(screenshot_base64)
-        with open("output_image.png", "wb") as f:
-            f.write(image_data)
-        logger.info("* Saved image data.")
-
-        # Now send that screenshot back as `computer_call_output`
-        call_output = self._build_input_dict(
-            call_id=computer_call.call_id,
-            output={
-                "type": "input_image",
-                "image_url": f"data:image/png;base64,{screenshot_base64}"
-            }
-        )
-        
-        new_response = self._create_response(
-            input_data=call_output,
+        # Take a screenshot (optionally saved for debugging in the background)
+        screenshot_base64 = self._get_screenshot()
+        if self._debug_save_screenshots:
+            self._save_debug_screenshot(screenshot_base64)
+
+        image_output = _screenshot_input_image(screenshot_base64, self.desktop.screenshot_mime_type)
+        call_outputs = [
+            self._build_input_dict(call_id=call.call_id, output=image_output, acknowledged_safety_checks=checks)
+            for call, checks in self._executed_calls
+        ]
+        self._executed_calls = []
+
+        return self._create_response(
+            input_data=call_outputs,
             previous_response_id=response.id,
             custom_tools=custom_tools
         )
 
-        # Recurse with the updated response
-        return self.computer_use_loop(new_response, custom_tools=custom_tools, function_map=function_map)
-
     @property
     def current_response(self):
         """Get the current response object."""
         return self._current_response
         
+    def _record_response(self, response):
+        """Append a response to the history and invalidate the cached read-only view."""
+        self._response_history.append(response)
+        self._response_history_view = None
+
+    def _record_input(self, new_input):
+        """Append an input to the history and invalidate the cached read-only view."""
+        self._input_history.append(new_input)
+        self._input_history_view = None
+
     @property
     def response_history(self):
-        """Get the history of all responses."""
-        return self._response_history.copy()
+        """Get the history of all responses as a read-only tuple."""
+        if self._response_history_view is None:
+            self._response_history_view = tuple(self._response_history)
+        return self._response_history_view
         
     @property
     def input_history(self):
-        """Get the history of all inputs."""
-        return self._input_history.copy()
+        """Get the history of all inputs as a read-only tuple."""
+        if self._input_history_view is None:
+            self._input_history_view = tuple(self._input_history)
+        return self._input_history_view
         
     @property
     def pending_call(self):
@@ -384,9 +509,13 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
         """Reset the agent's state, clearing all history and pending items."""
         self._response_history = []
         self._input_history = []
+        self._response_history_view = ()
+        self._input_history_view = ()
         self._current_response = None
         self._pending_call = None
         self._pending_safety_checks = []
+        self._call_queue = []
+        self._executed_calls = []
         self._needs_input = []
         self._error = None
         
@@ -442,97 +571,87 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
             
             If handlers are provided, this function may return different values based on the handler's execution.
         """
-        if self.desktop is None:
-            self._error = "No desktop has been set for this agent."
+        try:
+            status, data = self._run_action(input_text, acknowledged_safety_checks, ignore_safety_and_input,
+                                            tools=tools, function_map=function_map)
+            # Pass the result through any handlers provided (even in auto mode)
+            return self._process_result_with_handlers(status, data, complete_handler, needs_input_handler, 
+                                                    needs_safety_check_handler, error_handler, tools=tools, function_map=function_map)
+        except Exception as e:
+            self._error = str(e)
             error_result = AgentStatus.ERROR, self._error
             if error_handler:
                 error_handler(self._error)
             return error_result
+
+    def _run_action(self, input_text=None, acknowledged_safety_checks=False, ignore_safety_and_input=False,
+                    tools=None, function_map=None):
+        """Run a single step of `action` without invoking any handlers, returning (status, data)."""
+        if self.desktop is None:
+            self._error = "No desktop has been set for this agent."
+            return AgentStatus.ERROR, self._error
             
         try:
             # If we're ignoring safety and input, handle them automatically
             if ignore_safety_and_input:
-                status, data = self._handle_action_with_auto_responses(input_text, tools=tools, function_map=function_map)
-                # Even in auto mode, we should pass through handlers if provided
-                return self._process_result_with_handlers(status, data, complete_handler, needs_input_handler, 
-                                                        needs_safety_check_handler, error_handler, tools=tools, function_map=function_map)
+                return self._handle_action_with_auto_responses(input_text, tools=tools, function_map=function_map)
             
             # Case 1: Acknowledging safety checks for a pending call
             if acknowledged_safety_checks and self._pending_call:
-                status, data = self._handle_acknowledged_safety_checks(custom_tools=tools, function_map=function_map)
-                return self._process_result_with_handlers(status, data, complete_handler, needs_input_handler, 
-                                                        needs_safety_check_handler, error_handler, tools=tools, function_map=function_map)
+                return self._handle_acknowledged_safety_checks(custom_tools=tools, function_map=function_map)
                 
             # Case 2: Continuing a conversation with user input
             if self._needs_input and input_text is not None:
-                status, data = self._handle_user_input(input_text, tools=tools, function_map=function_map)
-                return self._process_result_with_handlers(status, data, complete_handler, needs_input_handler, 
-                                                        needs_safety_check_handler, error_handler, tools=tools, function_map=function_map)
+                return self._handle_user_input(input_text, tools=tools, function_map=function_map)
                 
             # Case 3: Starting a new conversation with a command
             if input_text is not None:
-                status, data = self._handle_new_command(input_text, tools=tools, function_map=function_map)
-                return self._process_result_with_handlers(status, data, complete_handler, needs_input_handler, 
-                                                        needs_safety_check_handler, error_handler, tools=tools, function_map=function_map)
+                return self._handle_new_command(input_text, tools=tools, function_map=function_map)
                 
             # If we get here, there's no valid action to take
             self._error = "No valid action to take. Provide input text or acknowledge safety checks."
-            error_result = AgentStatus.ERROR, self._error
-            if error_handler:
-                error_handler(self._error)
-            return error_result
+            return AgentStatus.ERROR, self._error
                 
         except Exception as e:
             self._error = str(e)
-            error_result = AgentStatus.ERROR, self._error
-            if error_handler:
-                error_handler(self._error)
-            return error_result
+            return AgentStatus.ERROR, self._error
             
     def _process_result_with_handlers(self, status, data, complete_handler, needs_input_handler, 
                                      needs_safety_check_handler, error_handler, tools=None, function_map=None):
-        """Process a result with the appropriate handler if provided."""
-        # If handlers are provided, use them to handle the different statuses
-        if status == AgentStatus.COMPLETE and complete_handler:
-            complete_handler(data)
-            return status, data
-            
-        elif status == AgentStatus.NEEDS_INPUT and needs_input_handler:
-            user_input = needs_input_handler(data)
-            if user_input:
-                # Continue with the provided input - pass all handlers
-                return self.action(
-                    input_text=user_input,
-                    complete_handler=complete_handler,
-                    needs_input_handler=needs_input_handler,
-                    needs_safety_check_handler=needs_safety_check_handler,
-                    error_handler=error_handler,
-                    tools=tools,
-                    function_map=function_map
-                )
-            return status, data
-            
-        elif status == AgentStatus.NEEDS_SAFETY_CHECK and needs_safety_check_handler:
-            proceed = needs_safety_check_handler(data["safety_checks"], data["pending_call"])
-            if proceed:
-                # Continue with acknowledged safety checks - pass all handlers
-                return self.action(
-                    acknowledged_safety_checks=True,
-                    complete_handler=complete_handler,
-                    needs_input_handler=needs_input_handler,
-                    needs_safety_check_handler=needs_safety_check_handler,
-                    error_handler=error_handler,
-                    tools=tools,
-                    function_map=function_map
-                )
-            return status, data
-            
-        elif status == AgentStatus.ERROR and error_handler:
-            error_handler(data)
-            return status, data
-            
-        # If no handler or handler didn't take action, return the result
-        return status, data
+        """
+        Process a result with the appropriate handler if provided.
+        
+        Handlers that continue the conversation (user input, acknowledged safety checks) are
+        followed iteratively rather than by re-entering `action`, so long handler-driven
+        sessions don't grow the call stack.
+        """
+        while True:
+            # If handlers are provided, use them to handle the different statuses
+            if status == AgentStatus.COMPLETE and complete_handler:
+                complete_handler(data)
+                return status, data
+                
+            elif status == AgentStatus.NEEDS_INPUT and needs_input_handler:
+                user_input = needs_input_handler(data)
+                if not user_input:
+                    return status, data
+                # Continue with the provided input
+                status, data = self._run_action(input_text=user_input, tools=tools, function_map=function_map)
+                
+            elif status == AgentStatus.NEEDS_SAFETY_CHECK and needs_safety_check_handler:
+                proceed = needs_safety_check_handler(data["safety_checks"], data["pending_call"])
+                if not proceed:
+                    return status, data
+                # Continue with acknowledged safety checks
+                status, data = self._run_action(acknowledged_safety_checks=True, tools=tools, function_map=function_map)
+                
+            elif status == AgentStatus.ERROR and error_handler:
+                error_handler(data)
+                return status, data
+                
+            else:
+                # If no handler or handler didn't take action, return the result
+                return status, data
             
     def _handle_action_with_auto_responses(self, input_text, tools=None, function_map=None):
         """Handle an action with automatic responses to safety checks and input requests."""
@@ -597,15 +716,17 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
         # Reset state for new conversation
         self._pending_call = None
         self._pending_safety_checks = []
+        self._call_queue = []
+        self._executed_calls = []
         self._needs_input = []
         self._function_map = function_map or {}
         
         # Create input and response
         new_input = self._build_input_dict("user", command_text)
-        self._input_history.append(new_input)
+        self._record_input(new_input)
         
         response = self._create_response(new_input, custom_tools=tools)
-        self._response_history.append(response)
+        self._record_response(response)
         self._current_response = response
         
         # Process the response
@@ -623,10 +744,10 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
             
         # Create input and response
         new_input = self._build_input_dict("user", input_text)
-        self._input_history.append(new_input)
+        self._record_input(new_input)
         
         response = self._create_response(new_input, previous_response_id=self._current_response.id, custom_tools=tools)
-        self._response_history.append(response)
+        self._record_response(response)
         self._current_response = response
         
         # Clear the needs_input flag since we've provided input
@@ -646,7 +767,16 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
             self._function_map = function_map
             
         # Execute the call with acknowledged safety checks
-        self._execute_and_continue_call(self._current_response, self._pending_call, self._pending_safety_checks, custom_tools=custom_tools)
+        next_call = self._execute_and_continue_call(self._current_response, self._pending_call, self._pending_safety_checks, custom_tools=custom_tools)
+
+        # A later call from the same response carries its own safety checks
+        if next_call:
+            self._pending_call = next_call
+            self._pending_safety_checks = next_call.pending_safety_checks
+            return AgentStatus.NEEDS_SAFETY_CHECK, {
+                "safety_checks": self._pending_safety_checks,
+                "pending_call": next_call
+            }
         
         # Clear the pending call and safety checks
         self._pending_call = None
@@ -782,6 +912,34 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
         else:
             raise ValueError("Either role or call_id must be provided")
 
+    def _get_default_tools(self):
+        """
+        Return the default tool definitions for the current desktop.
+        
+        The list is built once per desktop and shared across API calls; callers must not mutate it.
+        """
+        if self._default_tools is None:
+            self._default_tools = [
+                {
+                    "type": "computer_use_preview",
+                    "display_width": self.desktop.screen_width,
+                    "display_height": self.desktop.screen_height,
+                    "environment": self.desktop.environment
+                },
+                # {
+                #     "type": "function",
+                #     "name": "get_page_html",
+                #     "description": "Get the full HTML content of the currently displayed webpage. This is generally better than scrolling to see all content when you need the full context of a webpage.",
+                #     "parameters": {
+                #         "type": "object",
+                #         "properties": {},
+                #         "required": [],
+                #         "additionalProperties": False
+                #     }
+                # }
+            ]
+        return self._default_tools
+
     def _create_response(self, input_data, previous_response_id=None, reasoning=None, custom_tools=None):
         """
         Helper method to create a response from the OpenAI API.
@@ -799,31 +957,10 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
         if not isinstance(input_data, list):
             input_data = [input_data]
             
-        # Define default tools
-        default_tools = [
-            {
-                "type": "computer_use_preview",
-                "display_width": self.desktop.screen_width,
-                "display_height": self.desktop.screen_height,
-                "environment": self.desktop.environment
-            },
-            # {
-            #     "type": "function",
-            #     "name": "get_page_html",
-            #     "description": "Get the full HTML content of the currently displayed webpage. This is generally better than scrolling to see all content when you need the full context of a webpage.",
-            #     "parameters": {
-            #         "type": "object",
-            #         "properties": {},
-            #         "required": [],
-            #         "additionalProperties": False
-            #     }
-            # }
-        ]
-        
-        # Add custom tools if provided
-        tools = default_tools.copy()
+        # Reuse the cached default tools; only build a new list when custom tools are added
+        tools = self._get_default_tools()
         if custom_tools:
-            tools.extend(custom_tools)
+            tools = tools + list(custom_tools)
 
         params = {
             "model": "computer-use-preview",
@@ -856,46 +993,38 @@ Respond with only a single digit: 1 (yes, asking for input) or 0 (no, providing
     def _execute_and_continue_call(self, input, computer_call, safety_checks, custom_tools=None, function_map=None):
         """
         Helper for 'action': directly executes a 'computer_call' after user acknowledged
-        safety checks. Then performs the screenshot step, sending 'acknowledged_safety_checks'
-        in the computer_call_output.
+        safety checks, followed by the remaining calls from the same response. Then performs
+        the screenshot step, sending 'acknowledged_safety_checks' in the computer_call_output.
         
         Args:
             input: The input response object
             computer_call: The computer call to execute
             safety_checks: The safety checks that were acknowledged
             custom_tools: Optional list of additional tool definitions to include
+
+        Returns:
+            The next call from the same response that needs its own safety checks
+            acknowledged, or None once every call has been answered.
         """
         if self.desktop is None:
             raise ValueError("No desktop has been set for this agent.")
             
         # Actually execute the call
+        if self._call_queue and self._call_queue[0] is computer_call:
+            self._call_queue.pop(0)
         self.handle_model_action(computer_call.action)
-        time.sleep(1)
+        self._executed_calls.append((computer_call, safety_checks))
 
-        # Take a screenshot
-        screenshot_base64 = self.desktop.get_screenshot()
-        image_data = base64.b64decode(screenshot_base64)
-        with open("output_image.png", "wb") as f:
-            f.write(image_data)
-        logger.info("* Saved image data.")
+        # Run the calls that followed it, stopping at the next one with safety checks
+        next_call = self._run_queued_calls()
+        if next_call:
+            return next_call
 
         # Now, create a new response with an acknowledged_safety_checks field
         # in the computer_call_output
-        call_output = self._build_input_dict(
-            call_id=computer_call.call_id,
-            output={
-                "type": "input_image",
-                "image_url": f"data:image/png;base64,{screenshot_base64}"
-            },
-            acknowledged_safety_checks=safety_checks
-        )
-        
-        new_response = self._create_response(
-            input_data=call_output,
-            previous_response_id=input.id,
-            custom_tools=custom_tools,
-        )
+        new_response = self._send_call_outputs(input, custom_tools=custom_tools)
         
         # Add to response history
-        self._response_history.append(new_response)
-        self._current_response = new_response
\ No newline at end of file
+        self._record_response(new_response)
+        self._current_response = new_response
+        return None
\ No newline at end of file